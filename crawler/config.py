@@ -12,8 +12,29 @@ PRODUCT_PATTERNS = [
 
 # Outfile 
 OUTPUT_JSON = 'product_urls.json'
+# Per-domain result files, combined into OUTPUT_JSON at the end of a run.
+# Must be a dedicated directory: main.py deletes every *.json in it at startup.
+OUTPUT_DIR = 'out'
 # Maximum crawl depth: how many "hops" from the initial page the crawler will follow.
 MAX_DEPTH = 4
 
+# Number of concurrent fetch workers per domain; also the connector's per-host cap.
+CRAWL_CONCURRENCY = 8
+
+# Politeness cap: maximum requests started per second against a single domain.
+REQUESTS_PER_SECOND = 5
+
+# Total open connections allowed per crawl session (shared across domains).
+CONNECTION_LIMIT = 64
+
 # Timeout for each HTTP request (in seconds).
 REQUEST_TIMEOUT = 10
+
+# Longest a 429 Retry-After is honoured (in seconds); larger values are clamped.
+MAX_RETRY_AFTER = 60
+
+# Bodies are truncated past this many bytes; links beyond it are not followed.
+MAX_RESPONSE_BYTES = 2_000_000
+
+# User-Agent sent until robots.txt has been parsed (and if it can't be).
+DEFAULT_USER_AGENT = "MyDefaultAgent/1.0"
@@ -1,71 +1,76 @@
 import asyncio
 import logging
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
-import multiprocessing
-
-from crawler.domain_crawler import DomainCrawler
+from crawler.config import CONNECTION_LIMIT, CRAWL_CONCURRENCY
+from crawler.domain_crawler import DomainCrawler, create_session
 
 logger = logging.getLogger(__name__)
 
-def _crawl_domain_sync(domain: str):
-    """
-    Runs DomainCrawler for a single domain in its own event loop 
-    (since DomainCrawler is async).
-    
-    :return: (domain, list_of_product_urls)
-    """
-    logger.info(f"[_crawl_domain_sync] Starting domain: {domain}")
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-
-    crawler = DomainCrawler(domain)
-    loop.run_until_complete(crawler.crawl())
-    product_urls = crawler.get_product_urls()
-    loop.close()
-
-    logger.info(f"[_crawl_domain_sync] Finished domain: {domain} (found {len(product_urls)} products)")
-    return domain, product_urls
-
 class CrawlerManager:
     """
-    Manages crawling across multiple domains in parallel using multiprocessing.
+    Manages crawling across multiple domains concurrently on a single asyncio
+    event loop, with every DomainCrawler sharing one ClientSession.
     """
 
     def __init__(self, domains: list, max_workers: int = None):
         """
         :param domains: List of domain strings to crawl.
-        :param max_workers: Number of processes (defaults to CPU count).
+        :param max_workers: Maximum number of domains crawled at once. Defaults to
+                            as many as the shared connector can serve with every
+                            domain's workers busy (CONNECTION_LIMIT // CRAWL_CONCURRENCY),
+                            so requests don't time out waiting for a free connection.
         """
         self.domains = domains
         self.results = {}
-        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.max_workers = max_workers or max(1, CONNECTION_LIMIT // CRAWL_CONCURRENCY)
 
         logger.info(f"[CrawlerManager] Initialized with {len(domains)} domain(s), max_workers={self.max_workers}")
 
-    def run_crawler(self):
+    def run_crawler(self, on_result=None):
         """
-        Crawls all domains in parallel using a ProcessPoolExecutor. 
-        Aggregates partial results in real time.
+        Crawls all domains concurrently and blocks until they finish.
+
+        :param on_result: Optional callable(domain, product_urls) invoked as
+                          soon as each domain completes, for real-time output.
         """
         logger.info("[CrawlerManager] run_crawler started")
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            future_to_domain = {
-                executor.submit(_crawl_domain_sync, domain): domain
+        asyncio.run(self.crawl_all(on_result))
+        logger.info("[CrawlerManager] run_crawler finished")
+
+    async def crawl_all(self, on_result=None):
+        """
+        Async counterpart of run_crawler, for callers already inside an event loop.
+        """
+        semaphore = asyncio.Semaphore(self.max_workers)
+        async with create_session() as session:
+            await asyncio.gather(*(
+                self._crawl_domain(domain, session, semaphore, on_result)
                 for domain in self.domains
-            }
+            ))
 
-            # Collect results as soon as each domain finishes
-            for future in as_completed(future_to_domain):
-                domain = future_to_domain[future]
-                try:
-                    dom, product_urls = future.result()
-                    self.results[dom] = product_urls
-                    logger.info(f"[CrawlerManager] Domain completed: {dom}, products found: {len(product_urls)}")
-                except Exception as exc:
-                    logger.error(f"[CrawlerManager] {domain} raised an exception: {exc}")
+    async def _crawl_domain(self, domain: str, session, semaphore: asyncio.Semaphore, on_result):
+        """
+        Crawl one domain on the shared session and record its results.
+        Exceptions are logged so one failing domain doesn't cancel the rest.
+        """
+        async with semaphore:
+            logger.info(f"[CrawlerManager] Starting domain: {domain}")
+            try:
+                crawler = DomainCrawler(domain)
+                await crawler.crawl(session)
+                product_urls = crawler.get_product_urls()
+            except Exception as exc:
+                logger.error(f"[CrawlerManager] {domain} raised an exception: {exc}")
+                return
 
-        logger.info("[CrawlerManager] run_crawler finished")
+        self.results[domain] = product_urls
+        logger.info(f"[CrawlerManager] Domain completed: {domain}, products found: {len(product_urls)}")
+
+        if on_result is not None:
+            try:
+                on_result(domain, product_urls)
+            except Exception as exc:
+                logger.error(f"[CrawlerManager] Result handler failed for {domain}: {exc}")
 
     def get_results(self) -> dict:
         """
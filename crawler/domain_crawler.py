@@ -1,30 +1,85 @@
 import asyncio
 import logging
-import random
-import threading
 import aiohttp
 import os
 import json
+import random
 import re
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+import tempfile
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from html import unescape
+from urllib.parse import quote, urljoin, urlparse
 from urllib.robotparser import RobotFileParser
-from .config import PRODUCT_PATTERNS, MAX_DEPTH, REQUEST_TIMEOUT, OUTPUT_JSON
+from .config import (
+    PRODUCT_PATTERNS, MAX_DEPTH, REQUEST_TIMEOUT, OUTPUT_DIR, DEFAULT_USER_AGENT,
+    CRAWL_CONCURRENCY, CONNECTION_LIMIT, REQUESTS_PER_SECOND, MAX_RESPONSE_BYTES,
+    MAX_RETRY_AFTER,
+)
 
 logger = logging.getLogger(__name__)
 
+# All PRODUCT_PATTERNS folded into one alternation so each URL is scanned once.
+_PRODUCT_RE = re.compile("|".join(f"(?:{p})" for p in PRODUCT_PATTERNS))
+
+# Only <a href> values are needed, so scan the raw body instead of building a DOM.
+# The lookbehind keeps data-href/ng-href out; values may be double-, single- or unquoted.
+_HREF_RE = re.compile(
+    rb'<a\b[^>]*?(?<![\w-])href\s*=\s*(?:"([^"]+)"|\'([^\']+)\'|([^\s>"\'][^\s>]*))',
+    re.I,
+)
+
+# Link schemes that can never lead to a crawlable page.
+_SKIP_SCHEMES = ('mailto:', 'javascript:', 'tel:')
+
+def create_session() -> aiohttp.ClientSession:
+    """
+    Build the ClientSession used for crawling. One session (and so one
+    connection pool and DNS cache) can be shared by any number of crawlers.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=CRAWL_CONCURRENCY,
+        ttl_dns_cache=600,
+        enable_cleanup_closed=True,
+        keepalive_timeout=30,
+    )
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers={"User-Agent": DEFAULT_USER_AGENT},
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    )
+
+def _parse_retry_after(value: str, default: float = 5) -> float:
+    """
+    Seconds to wait for a Retry-After header, which may be either a number of
+    seconds or an HTTP-date (RFC 7231). Falls back to `default` if unparseable
+    and never exceeds MAX_RETRY_AFTER.
+    """
+    if not value:
+        return default
+    try:
+        seconds = int(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return default
+        if retry_at.tzinfo is None:
+            # "-0000" dates parse as naive; they are still UTC
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(0, seconds), MAX_RETRY_AFTER)
+
 class DomainCrawler:
     """
     Crawls a single domain, respecting robots.txt, picking a user agent,
     rate-limiting requests, handling 429 errors, and writing discovered product URLs
-    to JSON only after the entire domain has been crawled (no real-time writes).
+    to its own JSON file only after the entire domain has been crawled (no real-time writes).
 
     
     """
 
-    # A static (class-level) lock shared by all instances of DomainCrawler
-    _file_write_lock = threading.Lock()
-
     def __init__(self, domain: str):
         """
         :param domain: The exact domain string from main.py (e.g. "flipkart.com").
@@ -42,127 +97,210 @@ class DomainCrawler:
             self.netloc = parsed.path
 
         self.base_url = f"{self.scheme}://{self.netloc}"
+        self._host_prefixes = (f"http://{self.netloc}/", f"https://{self.netloc}/")
+        # Links are in-domain if their host is the crawl host or a subdomain of it.
+        # Compared on hostname, so ports and userinfo don't matter.
+        self._host_suffix = (urlparse(self.base_url).hostname or "").lstrip('.')
+        self._host_suffix_dot = '.' + self._host_suffix
 
-        logger.info(f"[DomainCrawler] Initialized crawler for domain: {self.original_domain}")
+        logger.info("[DomainCrawler] Initialized crawler for domain: %s", self.original_domain)
 
         # For internal use
-        self.visited_urls = set()
+        # 64-bit hashes of every URL ever enqueued (visited or pending) rather
+        # than the URL strings themselves; membership is the only question asked.
+        self._visited_hashes = set()
         self.product_urls = set()
-        self.cache = {}
         self.robot_parser = RobotFileParser()
         self.effective_user_agent = None
+        self._request_headers = None
+        self._rate_sem = asyncio.Semaphore(REQUESTS_PER_SECOND)
 
-    async def crawl(self):
+    async def crawl(self, session: aiohttp.ClientSession = None):
         """
         Main entry point: 
           - Load/parse robots.txt
-          - Recursively crawl from self.base_url
+          - Crawl from self.base_url with a pool of CRAWL_CONCURRENCY workers
           - Write all discovered product URLs to disk after finishing
+
+        :param session: Optional ClientSession to share with other crawlers.
+                        If omitted, one is created (via create_session) for
+                        this domain and closed when the crawl finishes.
         """
-        logger.info(f"[DomainCrawler] Starting crawl for {self.original_domain}")
-        await self._load_and_parse_robots_txt()
+        if session is None:
+            async with create_session() as own_session:
+                await self.crawl(own_session)
+            return
 
-        async with aiohttp.ClientSession() as session:
-            await self._crawl_url(self.base_url, depth=0, session=session)
+        logger.info("[DomainCrawler] Starting crawl for %s", self.original_domain)
+        await self._load_and_parse_robots_txt(session)
+
+        # FIFO frontier (a deque underneath): breadth-first, and each page's
+        # locals are released as soon as that page has been processed.
+        queue = asyncio.Queue()
+        self._visited_hashes.add(hash(self.base_url))
+        queue.put_nowait((self.base_url, 0))
+        workers = [
+            asyncio.create_task(self._worker(queue, session))
+            for _ in range(CRAWL_CONCURRENCY)
+        ]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
 
-        logger.info(f"[DomainCrawler] Finished crawl for {self.original_domain}")
+        logger.info("[DomainCrawler] Finished crawl for %s", self.original_domain)
 
         
         self._write_final_results()
 
-    async def _crawl_url(self, url: str, depth: int, session: aiohttp.ClientSession):
-        if url in self.visited_urls:
-            logger.debug(f"[DomainCrawler] Already visited: {url}")
-            return
-        if depth > MAX_DEPTH:
-            logger.debug(f"[DomainCrawler] Max depth exceeded at: {url}")
-            return
+    async def _worker(self, queue: asyncio.Queue, session: aiohttp.ClientSession):
+        """
+        Pull (url, depth) items off the queue until cancelled by crawl().
+        """
+        while True:
+            url, depth = await queue.get()
+            try:
+                await self._crawl_url(url, depth, queue, session)
+            except Exception as e:
+                logger.error("[DomainCrawler] Unexpected error crawling %s: %s", url, e)
+            finally:
+                queue.task_done()
 
+    async def _crawl_url(self, url: str, depth: int, queue: asyncio.Queue, session: aiohttp.ClientSession):
+        """
+        Fetch a single page, record product links and enqueue in-domain children.
+        URLs are marked seen when enqueued (synchronously, so workers never race),
+        which keeps duplicates out of the frontier altogether.
+        """
         if not self._can_fetch(url):
-            logger.debug(f"[DomainCrawler] Disallowed by robots.txt: {url}")
+            logger.debug("[DomainCrawler] Disallowed by robots.txt: %s", url)
             return
 
-        self.visited_urls.add(url)
-        logger.debug(f"[DomainCrawler] Fetching URL: {url} (depth={depth})")
+        logger.debug("[DomainCrawler] Fetching URL: %s (depth=%s)", url, depth)
 
-        html_content = await self._fetch(url, session)
-        if not html_content:
-            logger.debug(f"[DomainCrawler] No HTML content returned for: {url}")
+        body = await self._fetch(url, session)
+        if not body:
+            logger.debug("[DomainCrawler] No HTML content returned for: %s", url)
             return
 
-        soup = BeautifulSoup(html_content, 'html.parser')
-        for link_tag in soup.find_all('a', href=True):
-            href = link_tag['href']
-            absolute_url = urljoin(url, href)
-            parsed_url = urlparse(absolute_url)
-
-            # Follow only within the same netloc
-            if self.netloc not in parsed_url.netloc:
-                logger.debug(f"[DomainCrawler] Skipping external link: {absolute_url}")
+        page = urlparse(url)
+        page_origin = f"{page.scheme}://{page.netloc}"
+
+        # Pages repeat the same links (nav bars, product tiles); handle each once
+        for raw_href in {m.group(m.lastindex) for m in _HREF_RE.finditer(body)}:
+            href = raw_href.decode('utf-8', 'ignore').strip()
+            if '&' in href:
+                # Before the fragment split, so an encoded &#35; is stripped too
+                href = unescape(href)
+            href = href.split('#', 1)[0]
+            if not href or href.startswith(_SKIP_SCHEMES):
                 continue
 
+            if href.startswith('/') and not href.startswith('//') and '/.' not in href:
+                # Root-relative without dot-segments: same host as the page, no join/parse needed
+                absolute_url = page_origin + href
+            else:
+                absolute_url = urljoin(url, href)
+                # Follow only the same host or its subdomains; exact-host links skip urlparse
+                if not absolute_url.startswith(self._host_prefixes):
+                    host = urlparse(absolute_url).hostname or ""
+                    if host != self._host_suffix and not host.endswith(self._host_suffix_dot):
+                        logger.debug("[DomainCrawler] Skipping external link: %s", absolute_url)
+                        continue
+
             # Check product URL via regex
             if self._is_product_url(absolute_url):
-                logger.info(f"[DomainCrawler] Product URL found: {absolute_url}")
+                logger.info("[DomainCrawler] Product URL found: %s", absolute_url)
                 self.product_urls.add(absolute_url)
 
-            await self._crawl_url(absolute_url, depth + 1, session)
+            if depth < MAX_DEPTH:
+                url_hash = hash(absolute_url)
+                if url_hash not in self._visited_hashes:
+                    self._visited_hashes.add(url_hash)
+                    queue.put_nowait((absolute_url, depth + 1))
 
-    async def _fetch(self, url: str, session: aiohttp.ClientSession) -> str:
+    async def _fetch(self, url: str, session: aiohttp.ClientSession) -> bytes:
         """
-        Fetch with caching, random delay, 429 handling.
+        Fetch with per-host rate limiting, 429 handling.
         """
-        if url in self.cache:
-            logger.debug(f"[DomainCrawler] Cache hit: {url}")
-            return self.cache[url]
-
-       
-        delay = random.uniform(1, 2)
-        logger.debug(f"[DomainCrawler] Sleeping {delay:.2f}s before request to {url}")
-        await asyncio.sleep(delay)
-
         max_retries = 3
         attempt = 0
 
         while attempt < max_retries:
             attempt += 1
+            await self._acquire_rate_slot()
             try:
-                headers = {"User-Agent": self.effective_user_agent or "MyDefaultAgent/1.0"}
-                async with session.get(url, timeout=REQUEST_TIMEOUT, headers=headers) as response:
+                async with session.get(url, headers=self._request_headers) as response:
                     if response.status == 200:
-                        html = await response.text()
-                        self.cache[url] = html
-                        return html
+                        content_type = response.headers.get("Content-Type", "")
+                        if content_type and "html" not in content_type.lower():
+                            logger.debug("[DomainCrawler] Skipping non-HTML (%s) at %s", content_type, url)
+                            return b""
+                        return await self._read_capped(response)
                     elif response.status == 429:
-                        retry_after = response.headers.get("Retry-After", "5")
+                        delay = _parse_retry_after(response.headers.get("Retry-After"))
                         logger.warning(
-                            f"[DomainCrawler] 429 at {url}; waiting {retry_after}s "
-                            f"(attempt {attempt}/{max_retries})..."
+                            "[DomainCrawler] 429 at %s; retry after %.1fs (attempt %d/%d)",
+                            url, delay, attempt, max_retries,
                         )
-                        await asyncio.sleep(int(retry_after))
                     else:
-                        logger.warning(f"[DomainCrawler] Non-200 status {response.status} for {url}")
+                        logger.warning("[DomainCrawler] Non-200 status %s for %s", response.status, url)
                         break
             except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                logger.error(f"[DomainCrawler] Error fetching {url} (attempt {attempt}/{max_retries}): {e}")
-                await asyncio.sleep(2)
+                logger.error("[DomainCrawler] Error fetching %s (attempt %s/%s): %s", url, attempt, max_retries, e)
+                # Jittered exponential backoff: ~2s, ~4s
+                delay = 2 ** attempt + random.random()
 
-        return ""
+            # Wait outside the response context so the connection goes back to
+            # the pool, and don't wait at all once the retries are exhausted.
+            if attempt < max_retries:
+                await asyncio.sleep(delay)
+
+        return b""
+
+    @staticmethod
+    async def _read_capped(response: aiohttp.ClientResponse) -> bytes:
+        """
+        Read at most MAX_RESPONSE_BYTES of the (decompressed) body; anything
+        past the cap is left unread and dropped with the connection.
+        """
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= MAX_RESPONSE_BYTES:
+                break
+        return b"".join(chunks)[:MAX_RESPONSE_BYTES]
+
+    async def _acquire_rate_slot(self):
+        """
+        Leaky bucket: at most REQUESTS_PER_SECOND requests may start in any
+        one-second window. Each slot is handed back a second after it is taken.
+        """
+        await self._rate_sem.acquire()
+        asyncio.get_running_loop().call_later(1.0, self._rate_sem.release)
 
     def _is_product_url(self, url: str) -> bool:
         """
-        Checks PRODUCT_PATTERNS (regex) against the full URL.
+        Checks PRODUCT_PATTERNS (precompiled as _PRODUCT_RE) against the full URL.
         If any pattern matches, we consider it a product URL.
         """
-        for pattern in PRODUCT_PATTERNS:
-            if re.search(pattern, url):
-                logger.debug(f"[DomainCrawler] Regex match: pattern={pattern} in url={url}")
-                return True
+        match = _PRODUCT_RE.search(url)
+        if match:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("[DomainCrawler] Regex match: %r in url=%s", match.group(0), url)
+            return True
         return False
 
     def get_product_urls(self) -> list:
-        """Return a sorted list of discovered product URLs."""
-        return sorted(self.product_urls)
+        """
+        Return the discovered product URLs (unordered). Callers that persist
+        them sort once at write time.
+        """
+        return list(self.product_urls)
 
     def _can_fetch(self, url: str) -> bool:
         """
@@ -173,29 +311,28 @@ class DomainCrawler:
             return True
         return self.robot_parser.can_fetch(self.effective_user_agent, url)
 
-    async def _load_and_parse_robots_txt(self):
+    async def _load_and_parse_robots_txt(self, session: aiohttp.ClientSession):
         """
-        Attempts to read robots.txt from domain. 
+        Attempts to read robots.txt from domain using the crawl's shared session.
         Then picks a user-agent from the file (defaulting to '*').
         """
         robots_url = f"{self.scheme}://{self.netloc}/robots.txt"
-        logger.info(f"[DomainCrawler] Attempting to fetch robots.txt from {robots_url}")
+        logger.info("[DomainCrawler] Attempting to fetch robots.txt from %s", robots_url)
 
+        raw_robots = ""
         try:
-            self.robot_parser.set_url(robots_url)
-            self.robot_parser.read()
+            async with session.get(robots_url, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                if resp.status == 200:
+                    # Decode ourselves: resp.text() falls back to slow charset
+                    # sniffing when the server doesn't declare one.
+                    raw_robots = (await resp.read()).decode(resp.charset or "utf-8", errors="replace")
         except Exception as e:
-            logger.warning(f"[DomainCrawler] Failed to load robots.txt: {e}")
+            logger.warning("[DomainCrawler] Failed to load robots.txt for %s: %s", self.original_domain, e)
             return
 
-        raw_robots = ""
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(robots_url, timeout=5) as resp:
-                    if resp.status == 200:
-                        raw_robots = await resp.text()
-        except Exception as e:
-            logger.warning(f"[DomainCrawler] Could not manually fetch robots.txt for {self.original_domain}: {e}")
+        # Feed the text we already have to the parser instead of letting
+        # RobotFileParser.read() re-fetch it with blocking urllib I/O.
+        self.robot_parser.parse(raw_robots.splitlines())
 
         chosen_agent = None
         potential_agents = []
@@ -215,34 +352,40 @@ class DomainCrawler:
             chosen_agent = "*"
 
         self.effective_user_agent = chosen_agent
-        logger.info(f"[DomainCrawler] Chose user-agent '{self.effective_user_agent}' based on {robots_url}")
+        # Built once here so _fetch doesn't rebuild the header dict per request
+        self._request_headers = {"User-Agent": chosen_agent}
+        logger.info("[DomainCrawler] Chose user-agent '%s' based on %s", self.effective_user_agent, robots_url)
 
     def _write_final_results(self):
         """
-        Write all discovered product URLs to OUTPUT_JSON once the domain crawl is done.
-        We lock around the file to avoid collisions if multiple domains finish at the same time.
+        Write this domain's product URLs to its own file under OUTPUT_DIR once
+        the domain crawl is done. Each domain owns its file, so no lock or
+        read-modify-write is needed; main.py stitches them into OUTPUT_JSON.
         """
-        logger.info(f"[DomainCrawler] Writing final results for domain: {self.original_domain}")
-
-        with self._file_write_lock:
-            try:
-                if os.path.isfile(OUTPUT_JSON):
-                    with open(OUTPUT_JSON, "r", encoding="utf-8") as f:
-                        existing_data = json.load(f)
-                else:
-                    existing_data = {}
-
-                if self.original_domain not in existing_data:
-                    existing_data[self.original_domain] = []
-
-                existing_set = set(existing_data[self.original_domain])
-                existing_set.update(self.product_urls)
+        output_path = self.get_output_path()
+        logger.info("[DomainCrawler] Writing final results for domain: %s to %s", self.original_domain, output_path)
 
-                updated_list = sorted(existing_set)
-                existing_data[self.original_domain] = updated_list
-
-                with open(OUTPUT_JSON, "w", encoding="utf-8") as f:
-                    json.dump(existing_data, f, indent=4)
+        tmp_path = None
+        try:
+            os.makedirs(OUTPUT_DIR, exist_ok=True)
+            # Write to a temp file and rename it into place, so a failed write
+            # never leaves a truncated <domain>.json behind.
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=OUTPUT_DIR, suffix=".tmp", delete=False
+            ) as f:
+                tmp_path = f.name
+                json.dump({self.original_domain: sorted(self.product_urls)}, f, indent=4)
+            os.replace(tmp_path, output_path)
+        except Exception as e:
+            logger.error("[DomainCrawler] Failed to write final results to %s: %s", output_path, e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
-            except Exception as e:
-                logger.error(f"[DomainCrawler] Failed to write final results to {OUTPUT_JSON}: {e}")
+    def get_output_path(self) -> str:
+        """
+        Path of this domain's results file inside OUTPUT_DIR. Named after the
+        percent-encoded domain string as given, which is injective, so distinct
+        arguments (e.g. "shop.com/a" and "shop.com?a") never share a file.
+        """
+        filename = quote(self.original_domain, safe='') + ".json"
+        return os.path.join(OUTPUT_DIR, filename)
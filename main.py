@@ -3,9 +3,8 @@ import json
 import os
 import logging
 
-from concurrent.futures import ProcessPoolExecutor, as_completed
-from crawler.config import OUTPUT_JSON
-from crawler.crawler_manager import CrawlerManager, _crawl_domain_sync
+from crawler.config import OUTPUT_JSON, OUTPUT_DIR
+from crawler.crawler_manager import CrawlerManager
 
 OUTPUT_FILE = OUTPUT_JSON
 
@@ -19,30 +18,36 @@ def setup_logging():
         format="[%(levelname)s] %(name)s - %(message)s"
     )
 
-def read_existing_json(filepath: str) -> dict:
+def clear_domain_results():
     """
-    Read an existing JSON file if it exists, or return an empty dict.
+    Remove per-domain result files left in OUTPUT_DIR by a previous run.
     """
-    if os.path.isfile(filepath):
-        try:
-            with open(filepath, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-    return {}
-
-def write_partial_results(domain: str, product_urls: list):
+    if not os.path.isdir(OUTPUT_DIR):
+        return
+    for name in os.listdir(OUTPUT_DIR):
+        if name.endswith(".json"):
+            os.remove(os.path.join(OUTPUT_DIR, name))
+
+def combine_domain_results():
     """
-    Write partial results to output.json in real time:
-    1) Reads the current JSON (if any),
-    2) Updates with the new domain's results,
-    3) Writes it back to disk.
+    Stitch every per-domain file in OUTPUT_DIR into OUTPUT_FILE in one pass,
+    so each domain's results are read once and the combined file written once.
     """
-    existing_data = read_existing_json(OUTPUT_FILE)
-    existing_data[domain] = sorted(product_urls)
+    logger = logging.getLogger(__name__)
+    combined = {}
+    if os.path.isdir(OUTPUT_DIR):
+        for name in sorted(os.listdir(OUTPUT_DIR)):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(OUTPUT_DIR, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    combined.update(json.load(f))
+            except (OSError, TypeError, ValueError) as exc:
+                logger.warning("Could not read per-domain results %s, skipping: %s", path, exc)
 
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(existing_data, f, indent=4)
+        json.dump(combined, f, indent=4)
 
 def main():
     """
@@ -66,37 +71,28 @@ def main():
 
     logger.info("Script started with domains: %s", domains)
 
-    # Clear or create output.json so we start fresh
+    # Clear or create output.json (and stale per-domain files) so we start fresh
+    clear_domain_results()
     with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
         json.dump({}, f)
     logger.info("Initialized empty output file: %s", OUTPUT_FILE)
 
-    manager = CrawlerManager(domains=domains, max_workers=4)
+    manager = CrawlerManager(domains=domains)
     logger.info("Starting concurrent crawling...")
 
-    # Manage partial writes ourselves to get real-time updates in output.json
-    with ProcessPoolExecutor(max_workers=manager.max_workers) as executor:
-        future_to_domain = {
-            executor.submit(_crawl_domain_sync, domain): domain
-            for domain in domains
-        }
+    def on_result(finished_domain: str, product_urls: list):
+        # Each DomainCrawler has already written its own file under OUTPUT_DIR
+        logger.info("[main] %s finished with %d products, partial results written to %s.",
+                    finished_domain, len(product_urls), OUTPUT_DIR)
 
-        for future in as_completed(future_to_domain):
-            domain = future_to_domain[future]
-            try:
-                finished_domain, product_urls = future.result()
-                manager.results[finished_domain] = product_urls
+    manager.run_crawler(on_result=on_result)
 
-                # Real-time JSON write
-                write_partial_results(finished_domain, product_urls)
-                logger.info("[main] %s finished with %d products, partial results written.",
-                            finished_domain, len(product_urls))
-            except Exception as exc:
-                logger.error("[main] %s generated an exception: %s", domain, exc)
+    combine_domain_results()
+    logger.info("Combined per-domain results into %s", OUTPUT_FILE)
 
     # After all domains are done
     logger.info("All domains have been crawled. Final results:")
-    for d, urls in manager.results.items():
+    for d, urls in manager.get_results().items():
         logger.info("- %s: %d product URLs", d, len(urls))
 
 if __name__ == "__main__":